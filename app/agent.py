@@ -5,11 +5,51 @@ Supports multi-step tool use (Claude can call multiple tools in sequence).
 """
 
 import anthropic
+import asyncio
+import hashlib
+import inspect
 import json
 import os
 import time
+from diskcache import Cache
 from .tools import TOOL_DEFINITIONS, TOOL_FUNCTIONS
 
+try:
+    import orjson
+except ImportError:  # stdlib json is the fallback
+    orjson = None
+
+# Exact-repeat queries are answered from disk for this long; 0 disables the cache.
+RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR", "/tmp/finance-agent-cache")
+RESULT_CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", "3600"))
+# Paraphrase matches are looser than exact repeats, so they go stale sooner.
+SEMANTIC_CACHE_TTL = int(os.getenv("SEMANTIC_CACHE_TTL", "600"))
+
+# Tools whose output is large and stable enough to be worth a prompt-cache breakpoint.
+# Quotes change by the second, so get_stock_price and compare_stocks are left out.
+_CACHEABLE = {"get_company_fundamentals", "get_multi_fundamentals", "get_price_history", "get_stock_news"}
+
+# The @_tool wrapper takes *args/**kwargs, so a bad input only fails once the
+# coroutine runs; binding against the real signature catches it up front.
+_SIGNATURES = {name: inspect.signature(fn) for name, fn in TOOL_FUNCTIONS.items()}
+
+
+def _dumps(obj) -> str:
+    """Serialize a tool result to a JSON string, via orjson when it is available."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+        except orjson.JSONEncodeError:
+            pass  # e.g. ints wider than 64 bits; stdlib json handles them
+    return json.dumps(obj, default=str)
+
+
+def _fingerprint(obj) -> bytes:
+    """Canonical JSON bytes for hashing; key order never changes the digest."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS)
+    return json.dumps(obj, sort_keys=True, separators=(",", ":")).encode()
+
 
 SYSTEM_PROMPT = """You are an expert AI financial analyst agent. You have access to real-time market data tools.
 
@@ -33,75 +73,188 @@ IMPORTANT INSTRUCTIONS:
 You are NOT a financial advisor. Always remind users that this is for informational purposes only and they should consult a professional for investment decisions."""
 
 
-class FinanceAgent:
-    def __init__(self):
+_CLIENT = None
+
+
+def _get_client() -> anthropic.AsyncAnthropic:
+    """Process-wide client, so every agent shares one keep-alive pool to the API."""
+    global _CLIENT
+    if _CLIENT is None:
         api_key = os.getenv("ANTHROPIC_API_KEY")
         if not api_key:
             raise ValueError("ANTHROPIC_API_KEY environment variable is required")
-        self.client = anthropic.Anthropic(api_key=api_key)
+        _CLIENT = anthropic.AsyncAnthropic(api_key=api_key, max_retries=2, timeout=60.0)
+    return _CLIENT
+
+
+class FinanceAgent:
+    def __init__(self):
+        self.client = _get_client()
         self.model = "claude-sonnet-4-20250514"
+        self.result_cache = None
+        if RESULT_CACHE_TTL > 0:
+            self.result_cache = Cache(RESULT_CACHE_DIR, size_limit=500 * 1024 * 1024)
+        # Everything but the query that determines the answer; hashed once per agent.
+        self._cache_salt = hashlib.sha256(_fingerprint({"m": self.model, "s": SYSTEM_PROMPT, "t": TOOL_DEFINITIONS})).digest()
+        self.semantic_cache = None
+        if os.getenv("SEMANTIC_CACHE") == "1":
+            from .cache import SemanticCache
+            self.semantic_cache = SemanticCache(ttl=SEMANTIC_CACHE_TTL)
+
+    async def _run_tool(self, block) -> dict:
+        """Execute one tool_use block; tools are coroutines so independent calls overlap."""
+        if block.name not in TOOL_FUNCTIONS:
+            return {"error": f"Unknown tool: {block.name}"}
+        try:
+            _SIGNATURES[block.name].bind(**block.input)
+        except TypeError as e:
+            return {"error": f"Invalid arguments for {block.name}: {e}"}
+        return await TOOL_FUNCTIONS[block.name](**block.input)
+
+    def _cached_result(self, cached: dict, start_time: float) -> dict:
+        """Replay a cached analysis; this request made no LLM or tool calls."""
+        return {
+            "analysis": cached["analysis"],
+            # Nothing ran for this request; the list and the count must agree.
+            "tools_called": [],
+            "metrics": {
+                "total_tools_called": 0,
+                "input_tokens": 0,
+                "output_tokens": 0,
+                "cache_read_input_tokens": 0,
+                "cache_creation_input_tokens": 0,
+                "total_tokens": 0,
+                "latency_seconds": round(time.time() - start_time, 2),
+                "estimated_cost_usd": 0.0,
+                "cache_hit": True,
+            }
+        }
 
-    async def analyze(self, user_query: str) -> dict:
+    async def analyze(self, user_query: str, use_cache: bool = True) -> dict:
         """
         Run the agent loop:
         1. Send user query to Claude with tool definitions
-        2. Claude decides which tools to call
-        3. Execute tools and return results to Claude
+        2. Claude decides which tools to call (streamed)
+        3. Execute tools as each call arrives, concurrently, and return results to Claude
         4. Repeat until Claude gives final answer
+
+        With use_cache=False the cached answers are skipped, but the fresh
+        result still replaces them.
         """
         start_time = time.time()
+        cache_key = None
+        if self.result_cache is not None:
+            cache_key = hashlib.sha256(self._cache_salt + user_query.encode()).hexdigest()
+            # diskcache is blocking sqlite I/O, so keep it off the event loop.
+            cached = await asyncio.to_thread(self.result_cache.get, cache_key) if use_cache else None
+            if cached is not None:
+                return self._cached_result(cached, start_time)
+
+        query_vec = None
+        if self.semantic_cache is not None:
+            query_vec = await self.semantic_cache.embed(user_query)
+            cached = self.semantic_cache.lookup(query_vec, user_query) if use_cache else None
+            if cached is not None:
+                return self._cached_result(cached, start_time)
+
         messages = [{"role": "user", "content": user_query}]
         tools_called = []
+        result_breakpoint = None
         total_input_tokens = 0
         total_output_tokens = 0
+        cache_read_tokens = 0
+        cache_write_tokens = 0
 
         while True:
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=4096,
-                system=SYSTEM_PROMPT,
-                tools=TOOL_DEFINITIONS,
-                messages=messages
-            )
+            # Stream the turn so each tool starts as soon as its block is complete,
+            # overlapping tool I/O with the rest of Claude's generation.
+            pending = []
+            try:
+                async with self.client.messages.stream(
+                    model=self.model,
+                    max_tokens=4096,
+                    system=[{"type": "text", "text": SYSTEM_PROMPT, "cache_control": {"type": "ephemeral"}}],
+                    tools=TOOL_DEFINITIONS,
+                    messages=messages,
+                    extra_headers={"anthropic-beta": "prompt-caching-2024-07-31"}
+                ) as stream:
+                    async for event in stream:
+                        if event.type == "content_block_stop" and event.content_block.type == "tool_use":
+                            block = event.content_block
+                            pending.append((block, asyncio.create_task(self._run_tool(block))))
+                    response = await stream.get_final_message()
+            except BaseException:
+                for _, task in pending:
+                    task.cancel()
+                raise
 
             total_input_tokens += response.usage.input_tokens
             total_output_tokens += response.usage.output_tokens
+            cache_read_tokens += getattr(response.usage, "cache_read_input_tokens", 0) or 0
+            cache_write_tokens += getattr(response.usage, "cache_creation_input_tokens", 0) or 0
 
             if response.stop_reason == "tool_use":
-                tool_results = []
-                for block in response.content:
-                    if block.type == "tool_use":
-                        tool_name = block.name
-                        tool_input = block.input
-                        tool_id = block.id
+                try:
+                    results = await asyncio.gather(*(task for _, task in pending))
+                except BaseException:
+                    for _, task in pending:
+                        task.cancel()
+                    raise
 
-                        if tool_name in TOOL_FUNCTIONS:
-                            result = TOOL_FUNCTIONS[tool_name](tool_input)
-                            tools_called.append({"tool": tool_name, "input": tool_input, "success": "error" not in result})
-                        else:
-                            result = {"error": f"Unknown tool: {tool_name}"}
-                            tools_called.append({"tool": tool_name, "input": tool_input, "success": False})
+                tool_results = []
+                newest_cacheable = None
+                for (block, _), result in zip(pending, results):
+                    success = block.name in TOOL_FUNCTIONS and "error" not in result
+                    tools_called.append({"tool": block.name, "input": block.input, "success": success})
+                    tool_result = {"type": "tool_result", "tool_use_id": block.id, "content": [{"type": "text", "text": _dumps(result)}]}
+                    tool_results.append(tool_result)
+                    if success and block.name in _CACHEABLE:
+                        newest_cacheable = tool_result
 
-                        tool_results.append({"type": "tool_result", "tool_use_id": tool_id, "content": json.dumps(result, default=str)})
+                # The API allows 4 cache breakpoints and system + tools use two, so keep a
+                # single breakpoint that moves to the newest stable tool result.
+                if newest_cacheable is not None:
+                    if result_breakpoint is not None:
+                        del result_breakpoint["cache_control"]
+                    newest_cacheable["cache_control"] = {"type": "ephemeral"}
+                    result_breakpoint = newest_cacheable
 
                 messages.append({"role": "assistant", "content": response.content})
                 messages.append({"role": "user", "content": tool_results})
             else:
+                for _, task in pending:
+                    task.cancel()
                 final_text = ""
                 for block in response.content:
                     if hasattr(block, "text"):
                         final_text += block.text
 
                 elapsed = round(time.time() - start_time, 2)
-                return {
+                result = {
                     "analysis": final_text,
                     "tools_called": tools_called,
                     "metrics": {
                         "total_tools_called": len(tools_called),
                         "input_tokens": total_input_tokens,
                         "output_tokens": total_output_tokens,
-                        "total_tokens": total_input_tokens + total_output_tokens,
+                        "cache_read_input_tokens": cache_read_tokens,
+                        "cache_creation_input_tokens": cache_write_tokens,
+                        "total_tokens": total_input_tokens + cache_read_tokens + cache_write_tokens + total_output_tokens,
                         "latency_seconds": elapsed,
-                        "estimated_cost_usd": round((total_input_tokens * 0.003 / 1000) + (total_output_tokens * 0.015 / 1000), 4)
+                        # Cache reads bill at 10% of the input rate, cache writes at 125%.
+                        "estimated_cost_usd": round(
+                            (total_input_tokens * 0.003 / 1000)
+                            + (cache_read_tokens * 0.0003 / 1000)
+                            + (cache_write_tokens * 0.00375 / 1000)
+                            + (total_output_tokens * 0.015 / 1000), 4),
+                        "cache_hit": False,
                     }
                 }
+                # An answer written around failed tools ("couldn't retrieve data")
+                # must not be replayed once FMP recovers.
+                if all(t["success"] for t in tools_called):
+                    if cache_key is not None:
+                        await asyncio.to_thread(self.result_cache.set, cache_key, result, expire=RESULT_CACHE_TTL)
+                    if query_vec is not None:
+                        self.semantic_cache.add(query_vec, user_query, result)
+                return result
@@ -0,0 +1,66 @@
+"""
+Semantic cache for finished analyses.
+Paraphrased repeat questions ("Analyze AAPL" / "Give me an analysis of AAPL stock")
+are answered from memory instead of re-running the whole agent loop.
+Requires the optional sentence-transformers package: pip install sentence-transformers
+"""
+
+import asyncio
+import re
+import time
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+_TICKER_RE = re.compile(r"\b[A-Z]{1,5}\b")
+
+
+def extract_tickers(query: str) -> frozenset:
+    """Uppercase ticker-like tokens; used as a lexical gate on top of similarity."""
+    return frozenset(_TICKER_RE.findall(query))
+
+
+class SemanticCache:
+    def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+                 threshold: float = 0.92, ttl: float = 3600, max_entries: int = 1000):
+        self.model = SentenceTransformer(model_name)
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # Row i of _vectors belongs to _entries[i]; both are kept oldest first.
+        self._vectors = np.empty((0, self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+        self._entries = []
+
+    async def embed(self, query: str) -> np.ndarray:
+        """Normalized query embedding, computed off the event loop."""
+        vec = await asyncio.to_thread(self.model.encode, query, normalize_embeddings=True)
+        return vec.astype(np.float32)
+
+    def lookup(self, vec: np.ndarray, query: str):
+        """Return the cached result for the closest fresh query, or None."""
+        self._evict(time.time() - self.ttl)
+        if not self._entries:
+            return None
+
+        # Vectors are normalized, so the inner product is the cosine similarity.
+        scores = self._vectors @ vec
+        best = int(np.argmax(scores))
+        tickers, result, _ = self._entries[best]
+        # "compare AAPL vs MSFT" embeds close to "compare GOOG vs MSFT"; tickers must match exactly.
+        if scores[best] < self.threshold or tickers != extract_tickers(query):
+            return None
+        return result
+
+    def add(self, vec: np.ndarray, query: str, result: dict):
+        self._vectors = np.vstack([self._vectors, vec[np.newaxis, :]])
+        self._entries.append((extract_tickers(query), result, time.time()))
+        self._evict(time.time() - self.ttl)
+
+    def _evict(self, cutoff: float):
+        drop = 0
+        while drop < len(self._entries) and self._entries[drop][2] < cutoff:
+            drop += 1
+        drop = max(drop, len(self._entries) - self.max_entries)
+        if drop:
+            self._vectors = self._vectors[drop:]
+            del self._entries[:drop]
@@ -4,46 +4,481 @@ Uses Financial Modeling Prep STABLE API (new endpoints as of Aug 2025).
 Get your free API key at: https://financialmodelingprep.com/developer
 """
 
+import asyncio
+import hashlib
+import json
 import os
 import time
-import requests
-from datetime import datetime, timedelta
+import httpx
+import redis.asyncio as aioredis
+from aiolimiter import AsyncLimiter
+from cachetools import TTLCache
+from datetime import date, timedelta
+from functools import lru_cache, wraps
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential
+from types import MappingProxyType
+from urllib.parse import urlencode
+
+try:
+    import orjson
+except ImportError:  # stdlib json is the fallback
+    orjson = None
 
 FMP_KEY = os.getenv("FMP_API_KEY", "")
 BASE = "https://financialmodelingprep.com/stable"
 
+# Seconds a successful response stays fresh per endpoint; quotes move, profiles rarely do.
+CACHE_TTL = {
+    "quote": 10,
+    "batch-quote": 10,
+    "profile": 86400,
+    "historical-price-full": 3600,
+    "stock-news": 300,
+}
+DEFAULT_CACHE_TTL = 60
+
+# Optional shared cache behind the in-process one. Entries outlive their TTL so a
+# stale copy can still be served while FMP is failing.
+REDIS_URL = os.getenv("REDIS_URL", "")
+REDIS_STALE_TTL = 7 * 86400
+_REDIS = aioredis.from_url(REDIS_URL) if REDIS_URL else None
 
-def _fmp_get(endpoint, params=None):
-    """Make a request to FMP stable API."""
-    if not FMP_KEY:
-        return {"error": "FMP_API_KEY not set"}
-    if not params:
-        params = {}
-    params["apikey"] = FMP_KEY
+# One keep-alive pool for every tool call so only the first request pays the TLS handshake.
+# HTTP/2 lets a turn's concurrent tool calls multiplex over a single connection.
+_CLIENT = httpx.AsyncClient(
+    timeout=15,
+    transport=httpx.AsyncHTTPTransport(
+        http2=True,
+        retries=3,
+        limits=httpx.Limits(max_keepalive_connections=10, max_connections=20),
+    ),
+)
+
+# Pace requests proactively so parallel tool calls don't burst into FMP 429s,
+# and cap how many sockets are in flight at once.
+_LIMITER = AsyncLimiter(max_rate=float(os.getenv("FMP_RATE_LIMIT", "4")), time_period=1)
+_SOCKETS = asyncio.Semaphore(8)
+_RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Circuit breaker per endpoint: after BREAKER_THRESHOLD consecutive outage-type
+# failures (5xx, timeouts, connection errors), fail fast for BREAKER_COOLDOWN
+# seconds instead of making every tool call wait out its own timeout. 403s don't
+# count: FMP also uses them for plan-restricted endpoints, and they come back fast.
+# After the cooldown a single probe goes through while other calls still fail
+# fast; a failed probe reopens the circuit, a successful one closes it.
+BREAKER_THRESHOLD = 3
+BREAKER_COOLDOWN = 30
+_breakers = {}
+
+# Only touched from the event loop thread, so no locking is needed.
+_caches = {}
+# Lookups currently on the wire, so concurrent identical calls within one agent
+# turn (which all miss the TTL cache together) share a single fetch.
+_inflight = {}
+
+# Calendar days to request per period; padded so weekends still yield enough trading days.
+_PERIOD_MAP = MappingProxyType({
+    "1d": 2, "5d": 7, "1mo": 35, "3mo": 95,
+    "6mo": 185, "1y": 370, "2y": 740, "5y": 1830
+})
+
+# Public field name -> (FMP key, default) for callers that ask for a subset, so only
+# the fields Claude needs are built and sent back. The all-fields case, which is
+# most calls, is a dict literal in the tool itself (the fastest build); keep the two
+# in step.
+_QUOTE_FIELDS = MappingProxyType({
+    "name": ("name", "N/A"),
+    "price": ("price", None),
+    "change": ("change", None),
+    "change_percent": ("changePercentage", None),
+    "day_high": ("dayHigh", None),
+    "day_low": ("dayLow", None),
+    "year_high": ("yearHigh", None),
+    "year_low": ("yearLow", None),
+    "volume": ("volume", None),
+    "market_cap": ("marketCap", None),
+    "open": ("open", None),
+    "previous_close": ("previousClose", None),
+    "exchange": ("exchange", "N/A"),
+    "fifty_day_avg": ("priceAvg50", None),
+    "two_hundred_day_avg": ("priceAvg200", None),
+})
+
+_PROFILE_FIELDS = MappingProxyType({
+    "name": ("companyName", "N/A"),
+    "sector": ("sector", "N/A"),
+    "industry": ("industry", "N/A"),
+    "country": ("country", "N/A"),
+    "exchange": ("exchangeShortName", "N/A"),
+    "employees": ("fullTimeEmployees", None),
+    "ceo": ("ceo", "N/A"),
+    "website": ("website", "N/A"),
+    "description": ("description", ""),
+    "ipo_date": ("ipoDate", None),
+    "market_cap": ("mktCap", None),
+    "price": ("price", None),
+    "beta": ("beta", None),
+    "last_dividend": ("lastDiv", None),
+    "range": ("range", None),
+})
+
+# Quote lookups arriving within this many seconds share one batch-quote request
+# (a lone symbol goes to plain quote).
+QUOTE_BATCH_WINDOW = 0.05
+
+
+class FMPError(Exception):
+    """FMP could not return usable data; tools report it to Claude as {"error": ...}."""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status  # HTTP status when FMP answered with an error code
+
+
+def _tool(fn):
+    """Turn an FMPError raised inside a tool into the error dict Claude sees."""
+    @wraps(fn)
+    async def wrapper(*args, **kwargs):
+        try:
+            return await fn(*args, **kwargs)
+        except FMPError as e:
+            return {"error": str(e)}
+    return wrapper
+
+
+def _project(record, table, fields):
+    """Only the requested public fields of record; unknown names are ignored."""
+    return {name: record.get(*table[name]) for name in fields if name in table}
+
+
+def _cache_for(endpoint):
+    cache = _caches.get(endpoint)
+    if cache is None:
+        cache = _caches[endpoint] = TTLCache(maxsize=512, ttl=CACHE_TTL.get(endpoint, DEFAULT_CACHE_TTL))
+    return cache
+
+
+@lru_cache(maxsize=len(_PERIOD_MAP))
+def _date_range(period, day_bucket):
+    """(from, to) ISO dates for `period` ending on UTC day `day_bucket` (days since epoch)."""
+    end = date(1970, 1, 1) + timedelta(days=day_bucket)
+    start = end - timedelta(days=_PERIOD_MAP[period])
+    return start.isoformat(), end.isoformat()
+
+
+async def aclose():
+    """Close the shared FMP connection pool (and Redis, if configured)."""
+    await _CLIENT.aclose()
+    if _REDIS is not None:
+        await _REDIS.aclose()
+
+
+def _is_retryable(exc):
+    return isinstance(exc, httpx.HTTPStatusError) and exc.response.status_code in _RETRY_STATUSES
+
+
+def _is_outage(exc):
+    """True for failures that suggest FMP is down or refusing us, not a bad request."""
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code >= 500
+    return isinstance(exc, httpx.TransportError)
+
+
+def _breaker_for(endpoint):
+    breaker = _breakers.get(endpoint)
+    if breaker is None:
+        breaker = _breakers[endpoint] = {"open_until": 0.0, "fail_count": 0, "probing": False}
+    return breaker
+
+
+def _record_failure(breaker):
+    breaker["fail_count"] += 1
+    if breaker["fail_count"] >= BREAKER_THRESHOLD:
+        breaker["open_until"] = time.monotonic() + BREAKER_COOLDOWN
+
+
+@retry(wait=wait_exponential(multiplier=0.5), stop=stop_after_attempt(3),
+       retry=retry_if_exception(_is_retryable), reraise=True)
+async def _request(endpoint, params, reduce=None):
+    """GET an FMP endpoint within the rate limit, retrying throttled and 5xx responses.
+
+    Returns the parsed body, or whatever reduce(chunks) makes of the streamed body.
+    """
+    async with _LIMITER, _SOCKETS:
+        async with _CLIENT.stream("GET", f"{BASE}/{endpoint}", params=params) as r:
+            if r.status_code == 403:
+                await r.aread()
+                raise FMPError(f"FMP 403 on {endpoint}: {r.text[:200]}", status=403)
+            r.raise_for_status()
+            if reduce is not None:
+                return await reduce(r.aiter_bytes())
+            await r.aread()
+    return _decode(r.content)
+
+
+def _encode(obj):
+    return orjson.dumps(obj) if orjson is not None else json.dumps(obj).encode()
+
+
+def _decode(raw):
+    return orjson.loads(raw) if orjson is not None else json.loads(raw)
+
+
+async def _redis_get(redis_key):
+    """Stored {"t": fetched_at, "d": data} entry, or None on a miss or Redis trouble."""
     try:
-        r = requests.get(f"{BASE}/{endpoint}", params=params, timeout=15)
-        if r.status_code == 403:
-            return {"error": f"FMP 403 on {endpoint}: {r.text[:200]}"}
-        r.raise_for_status()
-        data = r.json()
-        if isinstance(data, dict) and "Error Message" in data:
-            return {"error": data["Error Message"]}
-        return data
+        raw = await _REDIS.get(redis_key)
+        return _decode(raw) if raw is not None else None
+    except (aioredis.RedisError, ValueError):
+        return None
+
+
+async def _redis_set(redis_key, data):
+    try:
+        await _REDIS.set(redis_key, _encode({"t": time.time(), "d": data}), ex=REDIS_STALE_TTL)
+    except aioredis.RedisError:
+        pass
+
+
+async def _fetch(endpoint, params, reduce=None):
+    """Hit FMP for endpoint; raises FMPError on any failure, or at once while its circuit is open."""
+    breaker = _breaker_for(endpoint)
+    is_probe = False
+    if breaker["fail_count"] >= BREAKER_THRESHOLD:
+        if breaker["probing"] or time.monotonic() < breaker["open_until"]:
+            raise FMPError(f"FMP circuit open for {endpoint}")
+        breaker["probing"] = is_probe = True
+    try:
+        data = await _request(endpoint, {**params, "apikey": FMP_KEY}, reduce)
+    except FMPError:  # 403
+        raise
     except Exception as e:
-        return {"error": str(e)}
+        if _is_outage(e):
+            _record_failure(breaker)
+        raise FMPError(str(e)) from e
+    finally:
+        # Only the probe may clear the flag; a slow call from before the circuit
+        # opened can outlive the cooldown and must not let a second probe in.
+        if is_probe:
+            breaker["probing"] = False
+    breaker["fail_count"] = 0
+    if isinstance(data, dict) and "Error Message" in data:
+        raise FMPError(data["Error Message"])
+    return data
+
+
+async def _fmp_get(endpoint, params=None, reduce=None):
+    """Make a request to FMP stable API, serving repeats within the endpoint TTL from cache.
+
+    With `reduce`, the body is streamed through it and its compact result is what gets
+    cached, so an endpoint must always be fetched with the same reducer.
+
+    Looks in memory first, joins an identical request already in flight, then tries
+    Redis when REDIS_URL is set. If FMP fails (or the circuit breaker is open) and
+    Redis still holds an expired copy, that copy is returned instead of the error.
+    Raises FMPError on any failure, so callers only ever see response data.
+    """
+    if not FMP_KEY:
+        raise FMPError("FMP_API_KEY not set")
+    params = dict(params or {})
+    key = tuple(sorted(params.items()))
+    cache = _cache_for(endpoint)
+    if key in cache:
+        return cache[key]
+
+    # Shielded so one caller being cancelled doesn't abort the fetch for the others.
+    flight_key = (endpoint, key)
+    task = _inflight.get(flight_key)
+    if task is None:
+        task = _inflight[flight_key] = asyncio.ensure_future(_load(endpoint, key, params, reduce))
+        task.add_done_callback(lambda _: _inflight.pop(flight_key, None))
+    return await asyncio.shield(task)
+
+
+async def _load(endpoint, key, params, reduce):
+    """Fill the in-process cache for key from Redis or FMP."""
+    cache = _cache_for(endpoint)
+    stored = redis_key = None
+    if _REDIS is not None:
+        digest = hashlib.blake2b(urlencode(key).encode(), digest_size=16).hexdigest()
+        # Reduced bodies get their own namespace so a changed reducer never reads
+        # entries shaped by another one out of Redis.
+        redis_key = f"fmp:{endpoint}:{reduce.__name__ if reduce else 'raw'}:{digest}"
+        stored = await _redis_get(redis_key)
+        if stored is not None and time.time() - stored["t"] < CACHE_TTL.get(endpoint, DEFAULT_CACHE_TTL):
+            cache[key] = stored["d"]
+            return stored["d"]
+
+    try:
+        data = await _fetch(endpoint, params, reduce)
+    except FMPError:
+        if stored is not None:
+            return stored["d"]
+        raise
+
+    cache[key] = data
+    if redis_key is not None:
+        await _redis_set(redis_key, data)
+    return data
+
+
+class _HistoryStats:
+    """Running aggregates over FMP historical rows, fed newest first."""
+
+    def __init__(self, keep=10):
+        self.keep = keep
+        self.recent = []
+        self.count = 0
+        self.start_close = self.end_close = self.hi = self.lo = None
+        self.vol_sum = self.vol_count = 0
+
+    def add(self, d):
+        close, volume = d.get("close"), d.get("volume")
+        if len(self.recent) < self.keep:
+            self.recent.append({"date": d.get("date"), "close": close, "volume": volume})
+        self.count += 1
+        # The first close seen ends the period and the last one seen starts it.
+        if close is not None:
+            if self.end_close is None:
+                self.end_close = self.hi = self.lo = close
+            elif close > self.hi:
+                self.hi = close
+            elif close < self.lo:
+                self.lo = close
+            self.start_close = close
+        if volume is not None:
+            self.vol_sum += volume
+            self.vol_count += 1
+
+    def as_dict(self):
+        return {
+            "data_points": self.count,
+            "recent": self.recent,
+            "start_close": self.start_close,
+            "end_close": self.end_close,
+            "high": self.hi,
+            "low": self.lo,
+            "avg_volume": round(self.vol_sum / self.vol_count) if self.vol_count else None,
+        }
 
 
-def get_stock_price(ticker):
-    """Get current stock price, change, and key trading metrics."""
-    data = _fmp_get("quote", {"symbol": ticker.upper()})
-    if isinstance(data, dict) and "error" in data:
+async def _reduce_history(chunks):
+    """Fold a historical-price-full body into _HistoryStats so only the summary is cached."""
+    data = _decode(b"".join([c async for c in chunks]))
+    if isinstance(data, dict) and "Error Message" in data:
+        return data  # _fetch turns this into FMPError
+    stats = _HistoryStats()
+    for d in (data.get("historical") if isinstance(data, dict) else None) or []:
+        stats.add(d)
+    return stats.as_dict()
+
+
+async def _reduce_news(chunks):
+    """Cut a stock-news body down to the article fields get_stock_news reports.
+
+    Runs before caching, so the memory and Redis copies hold 200-char summaries
+    rather than every article's full text.
+    """
+    data = _decode(b"".join([c async for c in chunks]))
+    if not isinstance(data, list):
         return data
-    if not data or not isinstance(data, list) or len(data) == 0:
-        return {"error": f"No data found for '{ticker}'"}
+    articles = []
+    for a in data[:5]:
+        text = a.get("text")
+        articles.append({
+            "title": a.get("title") or "N/A",
+            "source": a.get("site") or "N/A",
+            "date": a.get("publishedDate") or "N/A",
+            "summary": text[:200] if text else "",
+        })
+    return articles
+
+
+def _index_quotes(data):
+    """Map symbol -> raw quote for an FMP quote/batch-quote body."""
+    if not isinstance(data, list) or not all(isinstance(q, dict) for q in data):
+        raise FMPError("Unexpected quote response from FMP")
+    return {q.get("symbol"): q for q in data}
+
+
+async def _quote_one(symbol):
+    return _index_quotes(await _fmp_get("quote", {"symbol": symbol})).get(symbol)
+
+
+class _QuoteBatcher:
+    """Coalesce per-ticker quote lookups into a single batch-quote call."""
+
+    def __init__(self, window):
+        self.window = window
+        self._cache = TTLCache(maxsize=512, ttl=CACHE_TTL["quote"])
+        self._pending = {}
+        self._flush_task = None
+
+    async def get(self, symbol):
+        """Return the raw FMP quote for symbol or None if unknown; raises FMPError."""
+        if symbol in self._cache:
+            return self._cache[symbol]
+        fut = self._pending.get(symbol)
+        if fut is None:
+            fut = self._pending[symbol] = asyncio.get_running_loop().create_future()
+            if self._flush_task is None:
+                self._flush_task = asyncio.create_task(self._flush())
+        return await asyncio.shield(fut)
+
+    async def _flush(self):
+        await asyncio.sleep(self.window)
+        pending, self._pending, self._flush_task = self._pending, {}, None
+        # Every waiter must be resolved whatever happens here, or its caller hangs.
+        try:
+            if len(pending) == 1:
+                results = await self._fetch_each(pending)
+            else:
+                try:
+                    results = _index_quotes(await _fmp_get("batch-quote", {"symbols": ",".join(pending)}))
+                except FMPError as e:
+                    if e.status != 403:
+                        raise
+                    # batch-quote isn't on every FMP plan; plain quote is.
+                    results = await self._fetch_each(pending)
+        except Exception as e:
+            results = dict.fromkeys(pending, e if isinstance(e, FMPError) else FMPError(str(e)))
+
+        for symbol, fut in pending.items():
+            q = results.get(symbol)
+            if isinstance(q, Exception):
+                fut.set_exception(q)
+                continue
+            if q is not None:
+                self._cache[symbol] = q
+            fut.set_result(q)
+
+    @staticmethod
+    async def _fetch_each(symbols):
+        """symbol -> quote (or the FMPError it failed with), one quote call per symbol."""
+        found = await asyncio.gather(*(_quote_one(s) for s in symbols), return_exceptions=True)
+        results = {}
+        for symbol, q in zip(symbols, found):
+            if isinstance(q, Exception) and not isinstance(q, FMPError):
+                q = FMPError(str(q))
+            results[symbol] = q
+        return results
+
+
+_QUOTES = _QuoteBatcher(QUOTE_BATCH_WINDOW)
+
 
-    q = data[0]
+@_tool
+async def get_stock_price(ticker, fields=None):
+    """Get current stock price, change, and key trading metrics (optionally only `fields`)."""
+    symbol = ticker.upper()
+    q = await _QUOTES.get(symbol)
+    if q is None:
+        raise FMPError(f"No data found for '{ticker}'")
+
+    if fields:
+        return {"ticker": symbol, **_project(q, _QUOTE_FIELDS, fields)}
     return {
-        "ticker": ticker.upper(),
+        "ticker": symbol,
         "name": q.get("name", "N/A"),
         "price": q.get("price"),
         "change": q.get("change"),
@@ -62,17 +497,24 @@ def get_stock_price(ticker):
     }
 
 
-def get_company_fundamentals(ticker):
-    """Get company profile."""
-    data = _fmp_get("profile", {"symbol": ticker.upper()})
-    if isinstance(data, dict) and "error" in data:
-        return data
-    if not data or not isinstance(data, list) or len(data) == 0:
-        return {"error": f"No profile for '{ticker}'"}
+@_tool
+async def get_company_fundamentals(ticker, fields=None):
+    """Get company profile (optionally only `fields`)."""
+    symbol = ticker.upper()
+    data = await _fmp_get("profile", {"symbol": symbol})
+    if not data:
+        raise FMPError(f"No profile for '{ticker}'")
 
     p = data[0]
+    if fields:
+        out = {"ticker": symbol, **_project(p, _PROFILE_FIELDS, fields)}
+        if "description" in out:
+            out["description"] = out["description"][:500] if out["description"] else ""
+        return out
+
+    description = p.get("description")
     return {
-        "ticker": ticker.upper(),
+        "ticker": symbol,
         "name": p.get("companyName", "N/A"),
         "sector": p.get("sector", "N/A"),
         "industry": p.get("industry", "N/A"),
@@ -81,7 +523,7 @@ def get_company_fundamentals(ticker):
         "employees": p.get("fullTimeEmployees"),
         "ceo": p.get("ceo", "N/A"),
         "website": p.get("website", "N/A"),
-        "description": (p.get("description", "") or "")[:500],
+        "description": description[:500] if description else "",
         "ipo_date": p.get("ipoDate"),
         "market_cap": p.get("mktCap"),
         "price": p.get("price"),
@@ -91,78 +533,78 @@ def get_company_fundamentals(ticker):
     }
 
 
-def get_price_history(ticker, period="1mo"):
+@_tool
+async def get_price_history(ticker, period="1mo"):
     """Get historical prices."""
-    period_map = {
-        "1d": 2, "5d": 7, "1mo": 35, "3mo": 95,
-        "6mo": 185, "1y": 370, "2y": 740, "5y": 1830
-    }
-    days = period_map.get(period, 35)
-    start = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
-    end = datetime.now().strftime("%Y-%m-%d")
-
-    data = _fmp_get("historical-price-full", {
-        "symbol": ticker.upper(), "from": start, "to": end
-    })
-
-    if isinstance(data, dict) and "error" in data:
-        return data
+    symbol = ticker.upper()
+    # Unsupported periods fall back to 1mo up front, so the reported period matches
+    # the data and _date_range only ever sees the handful of supported keys.
+    period = period.strip().lower() if isinstance(period, str) else ""
+    if period not in _PERIOD_MAP:
+        period = "1mo"
+    start, end = _date_range(period, int(time.time() // 86400))
 
-    historical = data.get("historical", []) if isinstance(data, dict) else []
-    if not historical:
-        return {"error": f"No history for '{ticker}'"}
+    hist = await _fmp_get("historical-price-full", {
+        "symbol": symbol, "from": start, "to": end
+    }, reduce=_reduce_history)
 
-    historical.reverse()
-    prices = [{"date": d.get("date"), "close": d.get("close"), "volume": d.get("volume")} for d in historical]
-    closes = [p["close"] for p in prices if p["close"] is not None]
-
-    if not closes:
-        return {"error": f"No closing prices for '{ticker}'"}
+    if not hist["data_points"]:
+        raise FMPError(f"No history for '{ticker}'")
+    if hist["end_close"] is None:
+        raise FMPError(f"No closing prices for '{ticker}'")
 
+    start_close, end_close = hist["start_close"], hist["end_close"]
     return {
-        "ticker": ticker.upper(),
+        "ticker": symbol,
         "period": period,
-        "data_points": len(prices),
-        "recent_prices": prices[-10:],
+        "data_points": hist["data_points"],
+        # Rows are kept newest first; Claude gets them oldest first.
+        "recent_prices": hist["recent"][::-1],
         "summary": {
-            "start_price": closes[0],
-            "end_price": closes[-1],
-            "change_percent": round(((closes[-1] - closes[0]) / closes[0]) * 100, 2),
-            "period_high": round(max(closes), 2),
-            "period_low": round(min(closes), 2),
+            "start_price": start_close,
+            "end_price": end_close,
+            "change_percent": round(((end_close - start_close) / start_close) * 100, 2),
+            "period_high": round(hist["high"], 2),
+            "period_low": round(hist["low"], 2),
+            "avg_volume": hist["avg_volume"],
         }
     }
 
 
-def get_stock_news(ticker):
+@_tool
+async def get_stock_news(ticker):
     """Get latest news."""
-    data = _fmp_get("stock-news", {"symbol": ticker.upper(), "limit": 5})
-    if isinstance(data, dict) and "error" in data:
-        return data
-    if not data or not isinstance(data, list):
-        return {"ticker": ticker.upper(), "news": [], "message": "No recent news"}
+    symbol = ticker.upper()
+    data = await _fmp_get("stock-news", {"symbol": symbol, "limit": 5}, reduce=_reduce_news)
+    if not data:
+        return {"ticker": symbol, "news": [], "message": "No recent news"}
+
+    return {"ticker": symbol, "news_count": len(data), "articles": data}
 
-    articles = []
-    for a in data[:5]:
-        articles.append({
-            "title": a.get("title", "N/A"),
-            "source": a.get("site", "N/A"),
-            "date": a.get("publishedDate", "N/A"),
-            "summary": (a.get("text", "") or "")[:200],
-        })
 
-    return {"ticker": ticker.upper(), "news_count": len(articles), "articles": articles}
+@_tool
+async def get_multi_fundamentals(tickers):
+    """Get company profiles for several tickers at once, keyed by symbol."""
+    symbols = list(dict.fromkeys(t.upper() for t in tickers))[:5]
+    profiles = await asyncio.gather(*(get_company_fundamentals(s) for s in symbols))
+    # Partial results are still useful to Claude; only report failure when none came back.
+    if all("error" in p for p in profiles):
+        raise FMPError("; ".join(f"{s}: {p['error']}" for s, p in zip(symbols, profiles)) or "No tickers given")
+    return {"companies": dict(zip(symbols, profiles))}
 
 
-def compare_stocks(tickers):
+@_tool
+async def compare_stocks(tickers):
     """Compare stocks side by side."""
+    # Dedupe (order-preserving) before capping so "AAPL, aapl" doesn't use two of the 5 slots.
+    symbols = list(dict.fromkeys(t.upper() for t in tickers))[:5]
+    quotes = await asyncio.gather(*(_QUOTES.get(s) for s in symbols))
+
     comparisons = []
-    for t in tickers[:5]:
-        data = _fmp_get("quote", {"symbol": t.upper()})
-        if isinstance(data, list) and data:
-            q = data[0]
+    for t, q in zip(symbols, quotes):
+        if q:
             comparisons.append({
-                "ticker": q.get("symbol", t.upper()),
+                "ticker": q.get("symbol", t),
                 "name": q.get("name", "N/A"),
                 "price": q.get("price"),
                 "change_percent": q.get("changePercentage"),
@@ -171,19 +613,23 @@ def compare_stocks(tickers):
                 "year_high": q.get("yearHigh"),
                 "year_low": q.get("yearLow"),
             })
-        time.sleep(0.2)
 
     return {"stocks_compared": len(comparisons), "comparisons": comparisons}
 
 
-TOOL_DEFINITIONS = [
+TOOL_DEFINITIONS = (
     {
         "name": "get_stock_price",
         "description": "Get current stock price, daily change, volume, market cap, 52-week range, and moving averages.",
         "input_schema": {
             "type": "object",
             "properties": {
-                "ticker": {"type": "string", "description": "Stock ticker symbol (e.g., AAPL, GOOGL, NVDA)"}
+                "ticker": {"type": "string", "description": "Stock ticker symbol (e.g., AAPL, GOOGL, NVDA)"},
+                "fields": {
+                    "type": "array",
+                    "items": {"type": "string", "enum": list(_QUOTE_FIELDS)},
+                    "description": "Optional list of fields to return; defaults to all"
+                }
             },
             "required": ["ticker"]
         }
@@ -194,11 +640,27 @@ TOOL_DEFINITIONS = [
         "input_schema": {
             "type": "object",
             "properties": {
-                "ticker": {"type": "string", "description": "Stock ticker symbol"}
+                "ticker": {"type": "string", "description": "Stock ticker symbol"},
+                "fields": {
+                    "type": "array",
+                    "items": {"type": "string", "enum": list(_PROFILE_FIELDS)},
+                    "description": "Optional list of fields to return; defaults to all"
+                }
             },
             "required": ["ticker"]
         }
     },
+    {
+        "name": "get_multi_fundamentals",
+        "description": "Get company profiles for up to 5 tickers in one call, keyed by symbol.",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "tickers": {"type": "array", "items": {"type": "string"}, "description": "Ticker symbols (max 5)"}
+            },
+            "required": ["tickers"]
+        }
+    },
     {
         "name": "get_price_history",
         "description": "Get historical daily prices. Supports: 1d, 5d, 1mo, 3mo, 6mo, 1y, 2y, 5y.",
@@ -231,14 +693,20 @@ TOOL_DEFINITIONS = [
                 "tickers": {"type": "array", "items": {"type": "string"}, "description": "Ticker symbols to compare (max 5)"}
             },
             "required": ["tickers"]
-        }
+        },
+        # Breakpoint on the last tool caches the whole tool array across agent turns.
+        "cache_control": {"type": "ephemeral"}
     }
-]
-
-TOOL_FUNCTIONS = {
-    "get_stock_price": lambda args: get_stock_price(args["ticker"]),
-    "get_company_fundamentals": lambda args: get_company_fundamentals(args["ticker"]),
-    "get_price_history": lambda args: get_price_history(args["ticker"], args.get("period", "1mo")),
-    "get_stock_news": lambda args: get_stock_news(args["ticker"]),
-    "compare_stocks": lambda args: compare_stocks(args["tickers"]),
-}
+)
+
+# Tool input_schema property names match the function parameters, so the agent
+# dispatches with TOOL_FUNCTIONS[name](**tool_input) and no adapter closures.
+# Read-only, like TOOL_DEFINITIONS, so the dispatch table can't drift at runtime.
+TOOL_FUNCTIONS = MappingProxyType({
+    "get_stock_price": get_stock_price,
+    "get_company_fundamentals": get_company_fundamentals,
+    "get_multi_fundamentals": get_multi_fundamentals,
+    "get_price_history": get_price_history,
+    "get_stock_news": get_stock_news,
+    "compare_stocks": compare_stocks,
+})
@@ -2,17 +2,37 @@
 AI Finance Agent - FastAPI Server
 """
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, ORJSONResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
 import os
 import requests
 import uvicorn
 
+from app import tools
 from app.agent import FinanceAgent
 
-app = FastAPI(title="AI Finance Agent", version="1.0.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build the agent once per worker before serving, so no request pays the
+    # warm-up and concurrent first requests can't race to construct it.
+    # A missing API key shouldn't stop the server booting (health and the
+    # FMP probe still work); /api/analyze reports the error instead.
+    app.state.agent_error = None
+    try:
+        app.state.agent = FinanceAgent()
+    except ValueError as e:
+        app.state.agent = None
+        app.state.agent_error = str(e)
+    yield
+    await tools.aclose()
+
+
+app = FastAPI(title="AI Finance Agent", version="1.0.0", lifespan=lifespan, default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -22,14 +42,6 @@ app.add_middleware(
 )
 
 templates = Jinja2Templates(directory="templates")
-agent = None
-
-
-def get_agent():
-    global agent
-    if agent is None:
-        agent = FinanceAgent()
-    return agent
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -43,13 +55,18 @@ async def analyze(request: Request):
         body = await request.json()
         query = body.get("query", "").strip()
         if not query:
-            return JSONResponse({"error": "Query is required"}, status_code=400)
-        result = await get_agent().analyze(query)
-        return JSONResponse(result)
+            return ORJSONResponse({"error": "Query is required"}, status_code=400)
+        agent = request.app.state.agent
+        if agent is None:
+            return ORJSONResponse({"error": request.app.state.agent_error}, status_code=500)
+        # ?nocache=1 forces a fresh run past the exact-match and semantic caches.
+        use_cache = request.query_params.get("nocache") != "1"
+        result = await agent.analyze(query, use_cache=use_cache)
+        return ORJSONResponse(result)
     except ValueError as e:
-        return JSONResponse({"error": str(e)}, status_code=500)
+        return ORJSONResponse({"error": str(e)}, status_code=500)
     except Exception as e:
-        return JSONResponse({"error": f"Analysis failed: {str(e)}"}, status_code=500)
+        return ORJSONResponse({"error": f"Analysis failed: {str(e)}"}, status_code=500)
 
 
 @app.get("/api/health")
@@ -67,24 +84,28 @@ async def test_fmp():
     """Debug: test FMP API directly to see what works."""
     fmp_key = os.getenv("FMP_API_KEY", "")
     if not fmp_key:
-        return JSONResponse({"error": "FMP_API_KEY not set"})
+        return ORJSONResponse({"error": "FMP_API_KEY not set"})
 
-    results = {}
-    try:
-        r = requests.get(f"https://financialmodelingprep.com/api/v3/quote/AAPL?apikey={fmp_key}", timeout=10)
-        results["v3_quote_status"] = r.status_code
-        results["v3_quote_response"] = r.text[:500]
-    except Exception as e:
-        results["v3_quote_error"] = str(e)
-
-    try:
-        r = requests.get(f"https://financialmodelingprep.com/stable/quote?symbol=AAPL&apikey={fmp_key}", timeout=10)
-        results["stable_quote_status"] = r.status_code
-        results["stable_quote_response"] = r.text[:500]
-    except Exception as e:
-        results["stable_quote_error"] = str(e)
+    # The probes are independent blocking calls; run them in threads side by side
+    # instead of stalling the event loop for both in turn.
+    probes = {
+        "v3_quote": f"https://financialmodelingprep.com/api/v3/quote/AAPL?apikey={fmp_key}",
+        "stable_quote": f"https://financialmodelingprep.com/stable/quote?symbol=AAPL&apikey={fmp_key}",
+    }
+    responses = await asyncio.gather(
+        *(asyncio.to_thread(requests.get, url, timeout=10) for url in probes.values()),
+        return_exceptions=True,
+    )
 
-    return JSONResponse(results)
+    results = {}
+    for name, r in zip(probes, responses):
+        if isinstance(r, Exception):
+            results[f"{name}_error"] = str(r)
+        else:
+            results[f"{name}_status"] = r.status_code
+            results[f"{name}_response"] = r.text[:500]
+
+    return ORJSONResponse(results)
 
 
 if __name__ == "__main__":